@@ -0,0 +1,69 @@
+#!/usr/bin/env pypy
+
+import optparse
+import common
+
+GAMES = 10
+FRACTIONS = [0.125, 0.25, 0.5, 1.0] # RAVE budgets tried, relative to the baseline budget
+
+def play(iter_max, rave_player, rave_iter_max):
+    """ Play a game of uct against uct with RAVE, return the result from the viewpoint of the RAVE player.
+    """
+    state = common.new_game()
+
+    while state.get_moves():
+        rave = 3 - state.player_just_moved == rave_player
+        common.RAVE = rave
+        state.do_move(common.uct(state, rave_iter_max if rave else iter_max, verbose=False))
+
+    common.RAVE = False
+    return state.get_result(rave_player)
+
+def benchmark(iter_max, games):
+    """ Find the fewest RAVE iterations which beat iter_max plain uct iterations, at that budget
+        and at every larger one. A budget beats the baseline if it scores more than half of the
+        games: colours alternate, so in games where the first player wins, an even score only
+        means that each side won its games with the first move.
+    """
+    print "Baseline iterations:", iter_max
+    print "Games per budget:", games
+    print
+
+    passed = []
+    for f in FRACTIONS:
+        rave_iter_max = max(1, int(iter_max * f))
+        scores = {1: 0.0, 2: 0.0}
+        for g in range(games):
+            rave_player = 1 + g % 2 # alternate colours
+            scores[rave_player] += play(iter_max, rave_player, rave_iter_max)
+        score = scores[1] + scores[2]
+        print "RAVE iterations: %d score: %.1f/%d (%.3f) as player 1: %.1f/%d as player 2: %.1f/%d" % (
+            rave_iter_max, score, games, score / games, scores[1], (games + 1) / 2, scores[2], games / 2)
+        passed.append((rave_iter_max, score > games / 2.0))
+
+    matched = None
+    for (rave_iter_max, p) in reversed(passed):
+        if not p:
+            break
+        matched = rave_iter_max
+
+    print
+    if matched is not None:
+        print "RAVE beats the baseline from %d iterations on (%.1f%%)" % (matched, 100.0 * matched / iter_max)
+    else:
+        print "RAVE does not beat the baseline with the largest budget tried"
+
+if __name__ == "__main__":
+    parser = common.option_parser()
+    parser.add_option("-n", "--games", type="int", dest="games", default=GAMES, help="games per RAVE budget")
+    (options, args) = parser.parse_args()
+
+    try:
+        common.apply_options(options)
+    except optparse.OptionValueError, e:
+        parser.error(str(e))
+
+    if common.SYMMETRY: # play() turns RAVE on by itself, past the check in apply_options
+        parser.error("--symmetry can not be combined with RAVE")
+
+    benchmark(common.ITER_MAX, options.games)
@@ -0,0 +1,69 @@
+#!/usr/bin/env pypy
+
+import multiprocessing
+import common
+
+PLIES = 2
+ITER_MAX = 10000
+FILE_NAME = "opening.book"
+
+class SearchTree(common.SearchTree):
+    def __init__(self):
+        common.SearchTree.__init__(self)
+
+    def clean_sub_tree(self, root_node, ignore_node):
+        pass
+
+def opening_states(root_state, plies):
+    """ All distinct non-terminal states within the first plies moves of root_state.
+    """
+    states = {}
+    frontier = [root_state]
+    for i in range(plies + 1):
+        next_frontier = []
+        for state in frontier:
+            key = str(state)
+            if key in states or not state.get_moves():
+                continue
+            states[key] = state
+            for m in state.get_moves():
+                st = state.clone()
+                st.do_move(m)
+                next_frontier.append(st)
+        frontier = next_frontier
+    return states.values()
+
+def search(args):
+    """ Deep uct search of one opening state, returns its book entry.
+    """
+    (state, iter_max, seed) = args
+    tree = SearchTree()
+    move = common.uct(state, iter_max, search_tree=tree, verbose=False, rng=common.RandomStream(seed))
+    edge = common.SearchNode(tree_node=tree.get_node(state)).child_nodes()[common.canonical_move(state, move)]
+    visits = edge.visits() - 1.0 # through this move only, the child node may be shared by symmetric moves
+    return (common.OpeningBook.key(state), move, edge.node().value() * visits, visits)
+
+def build(file_name, plies, iter_max):
+    states = opening_states(common.new_game(), plies)
+
+    print "Opening states:", len(states)
+    print "Max iterations:", iter_max
+    print "Parallel count:", common.PARALLEL_COUNT
+    print
+
+    pool = multiprocessing.Pool(common.PARALLEL_COUNT)
+    entries = pool.map(search, [(s, iter_max, common.RNG.next_seed()) for s in states], chunksize=1)
+    pool.close()
+    pool.join()
+
+    common.OpeningBook.write(file_name, entries)
+    print "Book written:", file_name
+
+if __name__ == "__main__":
+    parser = common.option_parser()
+    parser.add_option("-k", "--plies", type="int", dest="plies", default=PLIES, help="book depth in plies")
+    parser.add_option("-o", "--output", dest="output", default=FILE_NAME, help="book file")
+    (options, args) = parser.parse_args()
+
+    common.apply_options(options)
+    build(options.output, options.plies, options.__iter_max if options.__iter_max is not None else ITER_MAX)
@@ -0,0 +1,116 @@
+#!/usr/bin/env pypy
+
+import os
+import sys
+import time
+import common
+
+ITER_MAX = 200
+PROBES = 3 # timed searches per configuration, after one warm-up search
+BATCH_SIZES = [50, 200]
+
+def strategies():
+    """ The uct function of every strategy and the search tree it takes, if any, as their scripts pass them to common.main().
+    """
+    root = __import__("uct-root-parallelization")
+    tree = __import__("uct-tree-parallelization")
+    leaf = __import__("uct-leaf-parallelization")
+    hybrid = __import__("uct-hybrid-parallelization")
+
+    return {
+        "serial": (common.uct, common.SearchTree),
+        "root": (root.uct, None),
+        "tree": (tree.uct, tree.SearchTree),
+        "leaf": (leaf.uct, common.SearchTree),
+        "hybrid": (hybrid.uct, None),
+    }
+
+def counts(limit):
+    """ Powers of two up to limit, and limit itself.
+    """
+    c = [1]
+    while c[-1] * 2 <= limit:
+        c.append(c[-1] * 2)
+    return sorted(set(c + [limit]))
+
+def candidates(cpu_count):
+    """ All configurations worth probing on a host with cpu_count processors.
+    """
+    configs = [{"strategy": "serial", "parallel": 1, "processes": 1, "threads": 1, "batch": common.BATCH_SIZE}]
+
+    for strategy in ["root", "tree", "leaf"]:
+        for n in counts(cpu_count):
+            configs.append({"strategy": strategy, "parallel": n, "processes": 1, "threads": 1, "batch": common.BATCH_SIZE})
+
+    for p in counts(cpu_count):
+        for t in counts(2 * cpu_count):
+            if p * t <= 2 * cpu_count:
+                for b in BATCH_SIZES:
+                    configs.append({"strategy": "hybrid", "parallel": p * t, "processes": p, "threads": t, "batch": b})
+
+    return configs
+
+def search(uct, search_tree, iter_max):
+    """ Return the seconds of one search from the initial state of the game.
+    """
+    state = common.new_game()
+    start = time.time()
+    if search_tree is not None:
+        uct(state, iter_max, search_tree())
+    else:
+        uct(state, iter_max)
+    return time.time() - start
+
+def probe(uct, search_tree, profile, iter_max):
+    """ Return the playouts per second of a configuration, from the median of PROBES searches.
+        Leaf parallelization plays one rollout per thread in every iteration, so it runs
+        iter_max / parallel iterations to play as many playouts as the other strategies.
+    """
+    common.apply_profile(profile)
+    if profile["strategy"] == "leaf":
+        iterations = max(1, iter_max / profile["parallel"])
+        playouts = iterations * profile["parallel"]
+    else:
+        iterations = playouts = iter_max
+
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w") # the strategies print their search statistics
+    try:
+        search(uct, search_tree, iterations) # warm-up, e.g. for the PyPy JIT
+        times = sorted([search(uct, search_tree, iterations) for i in range(PROBES)])
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return playouts / max(times[len(times) / 2], 1e-6)
+
+def calibrate(file_name, iter_max):
+    table = strategies()
+    best = None
+    best_rate = 0.0
+
+    print "Host:", common.profile_section(common.GAME)
+    print "Probe playouts:", iter_max
+    print "Probes:", PROBES
+    print
+
+    for profile in candidates(common.PARALLEL_COUNT):
+        (uct, search_tree) = table[profile["strategy"]]
+        rate = probe(uct, search_tree, profile, iter_max)
+        print "%s P:%d T:%d N:%d B:%d: %.1f playouts/s" % (profile["strategy"], profile["processes"], profile["threads"], profile["parallel"], profile["batch"], rate)
+
+        if best is None or rate > best_rate:
+            (best, best_rate) = (profile, rate)
+
+    common.write_profile(file_name, common.GAME, best)
+
+    print
+    print "Fastest:", best["strategy"], "written to", file_name
+
+if __name__ == "__main__":
+    parser = common.option_parser()
+    (options, args) = parser.parse_args()
+
+    common.apply_options(options)
+    common.RECORD_MEMORY = False # the probes would time the memory sampling along with the playouts
+    calibrate(options.profile, options.__iter_max if options.__iter_max is not None else ITER_MAX)
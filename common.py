@@ -16,11 +16,33 @@
 # For more information about Monte Carlo SearchTree Search check out our web site at www.mcts.ai
 
 import optparse
+import itertools
+import sys
 import random
 import sets
 import math
+import hashlib
+import struct
+import socket
+import platform
+import ConfigParser
 
 ITER_MAX = 100
+GAME = 1 # index into new_game()
+UNDO = False # replay moves on one state with undo_move instead of cloning states
+RAVE = False # blend all-moves-as-first statistics into the node values
+RAVE_EQUIVALENCE = 1000 # visits at which the AMAF and the uct estimates weigh the same
+SYMMETRY = False # pool states related by board symmetries as one tree node
+PROCESS_COUNT = None # parallel count / thread count if not given
+THREAD_COUNT = 2
+BATCH_SIZE = 100 # iterations each process of hybrid parallelization runs between two merges of the root statistics
+PROFILE_FILE = "uct.profile"
+SEED = None # master seed of all random streams, for reproducible runs
+RANDOM_BUFFER = 4096 # random numbers generated at once by a RandomStream
+MEMORY_SAMPLE = 1000 # tree nodes sampled to estimate the memory usage of a search tree
+RECORD_MEMORY = True # sample the memory usage at the end of verbose searches, off while timing searches
+MEMORY_COMPONENTS = ["keys", "node_objects", "states", "child_dicts", "untried_moves"]
+OPTIONS = None
 
 try:
     import java.lang
@@ -29,6 +51,78 @@ except ImportError:
     import multiprocessing
     PARALLEL_COUNT = multiprocessing.cpu_count()
 
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+class RandomStream:
+    """ An independent random number generator. Numbers are generated RANDOM_BUFFER at a time,
+        so that a rollout step costs an index into a list rather than a call into the generator.
+        Every worker should draw from its own stream, created by spawn() from the master stream
+        RNG, so that runs with the same SEED are reproducible.
+    """
+    def __init__(self, seed=None):
+        self.__random = random.Random(seed)
+        self.__buffer = []
+        self.__index = 0
+
+    def refill(self):
+        r = self.__random.random
+        self.__buffer = [r() for i in xrange(RANDOM_BUFFER)]
+        self.__index = 0
+
+    def random(self):
+        if self.__index == len(self.__buffer):
+            self.refill()
+        self.__index += 1
+        return self.__buffer[self.__index - 1]
+
+    def choice(self, seq):
+        if self.__index == len(self.__buffer):
+            self.refill()
+        self.__index += 1
+        return seq[int(self.__buffer[self.__index - 1] * len(seq))]
+
+    def next_seed(self):
+        """ A seed for a new stream, e.g. of a worker on another host.
+        """
+        return self.__random.getrandbits(64)
+
+    def spawn(self):
+        """ Create a new stream seeded from this one.
+        """
+        return RandomStream(self.next_seed())
+
+RNG = RandomStream(SEED) # master stream
+
+def symmetric_position(x, y, size, sym):
+    """ Map (x, y) by one of the 8 symmetries of a square board: bit 4 of sym transposes,
+        then bits 1 and 2 mirror x and y.
+    """
+    if sym & 4: (x, y) = (y, x)
+    if sym & 1: x = size - 1 - x
+    if sym & 2: y = size - 1 - y
+    return (x, y)
+
+def inverse_symmetric_position(x, y, size, sym):
+    """ Undo symmetric_position.
+    """
+    if sym & 1: x = size - 1 - x
+    if sym & 2: y = size - 1 - y
+    if sym & 4: (x, y) = (y, x)
+    return (x, y)
+
+SYMMETRY_TABLES = {}
+
+def symmetry_table(size):
+    """ For every symmetry, the positions of a board of size which end up at (0, 0), (0, 1), ... when it is applied.
+    """
+    if size not in SYMMETRY_TABLES:
+        positions = [(x, y) for x in range(size) for y in range(size)]
+        SYMMETRY_TABLES[size] = [[inverse_symmetric_position(x, y, size, sym) for (x, y) in positions] for sym in range(8)]
+    return SYMMETRY_TABLES[size]
+
 class GameState:
     """ A state of the game, i.e. the game __board. These are the only functions which are
         absolutely necessary to implement uct in any 2-player complete information deterministic 
@@ -52,6 +146,13 @@ class GameState:
         """
         self.player_just_moved = 3 - self.player_just_moved
         
+    def undo_move(self, move):
+        """ Take back the given move, which must be the last move carried out.
+            Only moves carried out since the state was created or cloned can be taken back.
+            Must restore player_just_moved.
+        """
+        self.player_just_moved = 3 - self.player_just_moved
+        
     def get_moves(self):
         """ Get all possible moves from this state.
         """
@@ -60,6 +161,9 @@ class GameState:
         """ Get the game result from the viewpoint of playerjm. 
         """
 
+    # Games with symmetric boards may also implement symmetry(), canonical(), transform_move(move, sym)
+    # and restore_move(move, sym) to have symmetric states share one tree node, see OthelloState.
+
     def __repr__(self):
         """ Don't need this - but good style.
         """
@@ -92,6 +196,12 @@ class NimState:
         self.__chips -= move
         self.player_just_moved = 3 - self.player_just_moved
         
+    def undo_move(self, move):
+        """ Take back the given move, which must be the last move carried out.
+        """
+        self.__chips += move
+        self.player_just_moved = 3 - self.player_just_moved
+        
     def get_moves(self):
         """ Get all possible moves from this state.
         """
@@ -125,13 +235,15 @@ class OthelloState:
         self.player_just_moved = 2 # At the root pretend the player just moved is p2 - p1 has the first move
         self.__board = [] # 0 = empty, 1 = player 1, 2 = player 2
         self.__size = size
+        self.__history = [] # counters flipped by each move, for undo_move
         for y in range(size):
             self.__board.append([0]*size)
         self.__board[size/2][size/2] = self.__board[size/2-1][size/2-1] = 1
         self.__board[size/2][size/2-1] = self.__board[size/2-1][size/2] = 2
         
     def clone(self):
-        """ Create a deep clone of this game state.
+        """ Create a deep clone of this game state. The clone starts with an empty
+            history, so undo_move can not take back moves carried out before cloning.
         """
         st = OthelloState()
         st.player_just_moved = self.player_just_moved
@@ -150,6 +262,17 @@ class OthelloState:
         self.__board[x][y] = self.player_just_moved
         for (a,b) in m:
             self.__board[a][b] = self.player_just_moved
+        self.__history.append(m)
+    
+    def undo_move(self, move):
+        """ Take back the given move, which must be the last move carried out.
+        """
+        (x,y) = (move[0],move[1])
+        assert self.__board[x][y] == self.player_just_moved
+        self.__board[x][y] = 0
+        for (a,b) in self.__history.pop():
+            self.__board[a][b] = 3 - self.player_just_moved
+        self.player_just_moved = 3 - self.player_just_moved
     
     def get_moves(self):
         """ Get all possible moves from this state.
@@ -195,6 +318,33 @@ class OthelloState:
     def is_on_board(self, x, y):
         return x >= 0 and x < self.__size and y >= 0 and y < self.__size
     
+    def symmetry(self):
+        """ The symmetry which maps this state to its canonical representative, the symmetric
+            state with the smallest board.
+        """
+        table = symmetry_table(self.__size)
+        keys = [[self.__board[a][b] for (a, b) in table[sym]] for sym in range(8)]
+        return min(range(8), key=lambda sym: keys[sym])
+
+    def canonical(self):
+        """ Return the canonical representative of this state and the symmetry which maps this state to it.
+        """
+        sym = self.symmetry()
+        st = self.clone()
+        cells = [self.__board[a][b] for (a, b) in symmetry_table(self.__size)[sym]]
+        st.__board = [cells[i*self.__size:(i+1)*self.__size] for i in range(self.__size)]
+        return (st, sym)
+
+    def transform_move(self, move, sym):
+        """ Map a move of this state to the state transformed by sym.
+        """
+        return symmetric_position(move[0], move[1], self.__size, sym)
+
+    def restore_move(self, move, sym):
+        """ Map a move of the state transformed by sym back to this state.
+        """
+        return inverse_symmetric_position(move[0], move[1], self.__size, sym)
+    
     def get_result(self, playerjm):
         """ Get the game result from the viewpoint of playerjm. 
         """
@@ -237,11 +387,13 @@ class GobangState:
         self.__size = size
         self.__inrow = inrow
         self.__terminated = False
+        self.__history = [] # termination flags before each move, for undo_move
         for y in range(size):
             self.__board.append([0]*size)
         
     def clone(self):
-        """ Create a deep clone of this game state.
+        """ Create a deep clone of this game state. The clone starts with an empty
+            history, so undo_move can not take back moves carried out before cloning.
         """
         st = GobangState()
         st.player_just_moved = self.player_just_moved
@@ -259,8 +411,18 @@ class GobangState:
         assert x == int(x) and y == int(y) and self.is_on_board(x,y) and self.__board[x][y] == 0
         self.player_just_moved = 3 - self.player_just_moved
         self.__board[x][y] = self.player_just_moved
+        self.__history.append(self.__terminated)
         self.__terminated = self.check_termination(x, y)
         
+    def undo_move(self, move):
+        """ Take back the given move, which must be the last move carried out.
+        """
+        (x,y) = (move[0],move[1])
+        assert self.__board[x][y] == self.player_just_moved
+        self.__board[x][y] = 0
+        self.__terminated = self.__history.pop()
+        self.player_just_moved = 3 - self.player_just_moved
+        
     def check_termination(self, x, y):
         assert self.__board[x][y] == self.player_just_moved
         
@@ -288,6 +450,33 @@ class GobangState:
     def is_on_board(self, x, y):
         return x >= 0 and x < self.__size and y >= 0 and y < self.__size
     
+    def symmetry(self):
+        """ The symmetry which maps this state to its canonical representative, the symmetric
+            state with the smallest board.
+        """
+        table = symmetry_table(self.__size)
+        keys = [[self.__board[a][b] for (a, b) in table[sym]] for sym in range(8)]
+        return min(range(8), key=lambda sym: keys[sym])
+
+    def canonical(self):
+        """ Return the canonical representative of this state and the symmetry which maps this state to it.
+        """
+        sym = self.symmetry()
+        st = self.clone()
+        cells = [self.__board[a][b] for (a, b) in symmetry_table(self.__size)[sym]]
+        st.__board = [cells[i*self.__size:(i+1)*self.__size] for i in range(self.__size)]
+        return (st, sym)
+
+    def transform_move(self, move, sym):
+        """ Map a move of this state to the state transformed by sym.
+        """
+        return symmetric_position(move[0], move[1], self.__size, sym)
+
+    def restore_move(self, move, sym):
+        """ Map a move of the state transformed by sym back to this state.
+        """
+        return inverse_symmetric_position(move[0], move[1], self.__size, sym)
+    
     def get_result(self, playerjm):
         """ Get the game result from the viewpoint of playerjm. 
         """
@@ -305,16 +494,88 @@ class GobangState:
         
         return s
     
-def uct_play_game(uct, search_tree):
+def new_game(game=None):
+    """ Create the initial state of the game to be played.
+    """
+    return [NimState(15), OthelloState(8), GobangState(8, 5)][game if game is not None else GAME]
+
+class OpeningBook:
+    """ A book of precomputed moves, stored as fixed size records sorted by state hash:
+        8 bytes of md5(str(state)), the move as two shorts (y is -1 for integer moves),
+        then wins and visits of the move as floats.
+        The file is memory-mapped, so opening a book costs nothing until it is used.
+    """
+    record = struct.Struct("<8shhff")
+
+    def __init__(self, file_name):
+        self.__file = open(file_name, "rb")
+        if mmap is not None:
+            self.__data = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.__data = self.__file.read()
+        self.__count = len(self.__data) / self.record.size
+
+    @staticmethod
+    def key(state):
+        return hashlib.md5(str(state)).digest()[:8]
+
+    @staticmethod
+    def encode_move(move):
+        return move if isinstance(move, tuple) else (move, -1)
+
+    @staticmethod
+    def decode_move(x, y):
+        return (x, y) if y != -1 else x
+
+    @classmethod
+    def write(cls, file_name, entries):
+        """ Write entries of (state key, move, wins, visits) to file_name.
+        """
+        with open(file_name, "wb") as f:
+            for (key, move, wins, visits) in sorted(entries):
+                (x, y) = cls.encode_move(move)
+                f.write(cls.record.pack(key, x, y, wins, visits))
+
+    def size(self):
+        return self.__count
+
+    def lookup(self, state):
+        """ Return (move, wins, visits) stored for state, or None if state is not in the book.
+        """
+        key = self.key(state)
+        (lo, hi) = (0, self.__count)
+        while lo < hi: # binary search over the sorted records
+            mid = (lo + hi) / 2
+            offset = mid * self.record.size
+            k = self.__data[offset:offset + 8]
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                (k, x, y, wins, visits) = self.record.unpack_from(self.__data, offset)
+                return (self.decode_move(x, y), wins, visits)
+        return None
+
+    def close(self):
+        if mmap is not None:
+            self.__data.close()
+        self.__file.close()
+
+def uct_play_game(uct, search_tree, book=None):
     """ Play a sample game between two uct players
     """
-    state = [NimState(15), OthelloState(8), GobangState(8, 5)][1]
+    state = new_game()
     
     while state.get_moves():
         print str(state)
         print
         
-        if search_tree is not None:
+        entry = book.lookup(state) if book is not None else None
+        if entry is not None and entry[0] in state.get_moves(): # guard against hash collisions
+            (m, wins, visits) = entry
+            print "Book move: W/V:%.1f/%.1f(%.3f)" % (wins, visits, wins / visits)
+        elif search_tree is not None:
             m = uct(state, ITER_MAX, search_tree)
         else:
             m = uct(state, ITER_MAX)
@@ -331,16 +592,119 @@ def uct_play_game(uct, search_tree):
     else: print "Nobody wins!"
 
 
+try:
+    sys.getsizeof(0)
+    SIZEOF_EXACT = True
+except (TypeError, AttributeError): # not implemented by PyPy and Jython
+    SIZEOF_EXACT = False
+
+def estimated_sizeof(obj):
+    """ Size obj would have on 64 bit CPython 2.7, from its type and length.
+    """
+    if obj is None:
+        return 16
+    if isinstance(obj, (int, float)):
+        return 24
+    if isinstance(obj, str):
+        return 37 + len(obj)
+    if isinstance(obj, tuple):
+        return 56 + 8 * len(obj)
+    if isinstance(obj, list):
+        return 72 + 8 * len(obj)
+    if isinstance(obj, (dict, set, frozenset)):
+        slots = 8 # hash tables of up to 5 items fit in the object itself
+        while len(obj) * 3 >= slots * 2: # grown like CPython does while inserting
+            used = (slots * 2 + 2) / 3
+            minused = used * (2 if used > 50000 else 4)
+            slots = 8
+            while slots <= minused:
+                slots *= 2
+        (size, entry) = (280, 24) if isinstance(obj, dict) else (232, 16)
+        return size + (entry * slots if slots > 8 else 0)
+    return 72 # instance
+
+def sizeof(obj):
+    """ Size of obj in bytes, estimated by estimated_sizeof() where the interpreter can not tell.
+    """
+    return sys.getsizeof(obj) if SIZEOF_EXACT else estimated_sizeof(obj)
+
+def deep_sizeof(obj, seen=None):
+    """ Approximate size of obj and of everything it holds through containers and instance attributes.
+    """
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sizeof(obj)
+    if isinstance(obj, dict):
+        size += sum([deep_sizeof(k, seen) + deep_sizeof(v, seen) for (k, v) in obj.iteritems()])
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum([deep_sizeof(o, seen) for o in obj])
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(obj.__dict__, seen)
+    return size
+
+def memory2string(usage):
+    s = "%.1f KB (keys %.1f KB, node objects %.1f KB, states %.1f KB, child dicts %.1f KB, untried moves %.1f KB)" % tuple(
+        [usage["total"] / 1024.0] + [usage[k] / 1024.0 for k in MEMORY_COMPONENTS])
+    return s if usage["exact"] else s + ", estimated from object counts"
+
+class TreeEdge:
+    """
+    An edge from a tree node to one of its children. Since identical states share one tree node,
+    a child may be reached through several edges: the child's wins and visits are shared by all
+    of them, while the edge counts only the visits which went through this particular edge.
+    """
+    def __init__(self, node):
+        self.__node = node
+        self.__visits = 1.0
+        self.__amaf_wins = 0.0 # all-moves-as-first statistics of the move of this edge
+        self.__amaf_visits = 0.0
+        
+    def node(self):
+        return self.__node
+    
+    def visits(self):
+        return self.__visits
+    
+    def value(self):
+        """ The value of the child, blended with the AMAF value in RAVE mode. The weight of the
+            AMAF value decays as sqrt(k / (3n + k)) with n edge visits and k = RAVE_EQUIVALENCE.
+        """
+        if not RAVE or self.__amaf_visits == 0.0:
+            return self.__node.value()
+        beta = math.sqrt(RAVE_EQUIVALENCE / (3 * self.__visits + RAVE_EQUIVALENCE))
+        return (1.0 - beta) * self.__node.value() + beta * self.__amaf_wins / self.__amaf_visits
+    
+    def ucb(self, parent, constant):
+        return self.value() + constant * math.sqrt(2 * math.log(parent.edge_visits()) / self.__visits)
+    
+    def update(self, visits=1.0):
+        self.__visits += visits
+        
+    def update_amaf(self, result):
+        self.__amaf_visits += 1.0
+        self.__amaf_wins += float(result)
+        
+    def __repr__(self):
+        s = "N:" + str(self.__visits) + " "
+        if self.__amaf_visits > 0.0:
+            s += "AMAF:" + str(self.__amaf_wins) + "/" + str(self.__amaf_visits) + " "
+        return s + str(self.__node)
+
 class TreeNode:
     """
     A tree node will be stored in a tree structure constantly during process running
     """
-    def __init__(self, state):
+    def __init__(self, state, keep_state=True):
         self.__wins = 0.0
         self.__visits = 1.0;
+        self.__edge_visits = 0.0 # sum of the visits of all outgoing edges
         
-        self.__state = state.clone()
-        self.__child_nodes = {}                
+        self.__state = state.clone() if keep_state else None # None if moves are replayed with undo_move
+        self.__player_just_moved = state.player_just_moved
+        self.__child_nodes = {} # move -> TreeEdge
         self.__untried_moves = state.get_moves() # future child nodes
         
     def state(self):
@@ -353,34 +717,76 @@ class TreeNode:
         return self.__untried_moves
     
     def player_just_moved(self):
-        return self.__state.player_just_moved
+        return self.__player_just_moved
         
+    def wins(self):
+        return self.__wins
+    
+    def visits(self):
+        return self.__visits
+    
+    def edge_visits(self):
+        return self.__edge_visits
+    
     def value(self):
         return self.__wins / self.__visits
         
-    def ucb(self, parent, constant):
-        return self.value() + constant * math.sqrt(2 * math.log(parent.__visits) / self.__visits)
-                           
     def update(self, get_result):
         self.__visits += 1.0
         self.__wins += float(get_result)        
         
+    def update_edge(self, move, visits=1.0):
+        """ Count visits through the edge of move.
+        """
+        self.__child_nodes[move].update(visits)
+        self.__edge_visits += visits
+        
+    def update_amaf(self, played, results):
+        """ Update the AMAF statistics of every child whose move was played later in the
+            iteration by the player to move here. played holds (player, move) pairs and
+            results maps each player to the game result from its viewpoint.
+        """
+        player = 3 - self.__player_just_moved
+        for (m, e) in self.__child_nodes.items():
+            if (player, m) in played:
+                e.update_amaf(results[player])
+        
+    def merge(self, wins, visits):
+        """ Add statistics gathered elsewhere, e.g. by another process searching the same state.
+        """
+        self.__visits += visits
+        self.__wins += wins
+        
     def add_child(self, fm, n):
         if fm in self.__untried_moves:
             self.__untried_moves.remove(fm)
         
         if fm not in self.__child_nodes:
-            self.__child_nodes[fm] = n
+            self.__child_nodes[fm] = TreeEdge(n)
+            self.__edge_visits += self.__child_nodes[fm].visits()
+       
+    def memory_usage(self, seen=None):
+        """ Approximate bytes used by this node, without its children and the pool key.
+            Objects whose ids are in seen are not counted again, pass the same set for
+            all nodes measured together.
+        """
+        seen = seen if seen is not None else set()
+        return {
+            "node_objects": sizeof(self) + sizeof(self.__dict__),
+            "states": deep_sizeof(self.__state, seen) if self.__state is not None else 0,
+            "child_dicts": sizeof(self.__child_nodes) + sum([sizeof(e) + sizeof(e.__dict__) for e in self.__child_nodes.itervalues()]),
+            "untried_moves": deep_sizeof(self.__untried_moves, seen),
+        }
        
     def traverse(self, fun):
         for c in self.child_nodes().values():
-            c.traverse(fun)
+            c.node().traverse(fun)
         fun(self)
 
     def tree2string(self, indent):
         s = self.indent_string(indent) + str(self)
         for c in self.child_nodes().values():
-            s += c.tree2string(indent+1)
+            s += c.node().tree2string(indent+1)
         return s
 
     def indent_string(self, indent):
@@ -392,11 +798,60 @@ class TreeNode:
     def __repr__(self):
         return "W/V:" + str(self.__wins) + "/" + str(self.__visits) + "(" + str(int(1000 * self.value()) / 1000.0) + ")" + " U:" + str(self.__untried_moves)
     
+def stateless_tree_node(state):
+    """ Create a tree node which does not keep a clone of state, for searches which
+        replay and take back moves on a single state instead.
+    """
+    return TreeNode(state, False)
+
+def canonical(state):
+    """ Return the state under which state is pooled and the symmetry which maps state to it.
+        Without SYMMETRY, or for games without symmetries, that is state itself.
+    """
+    if SYMMETRY and hasattr(state, "canonical"):
+        return state.canonical()
+    return (state, 0)
+
+def canonical_move(state, move):
+    """ Map a move of state to its canonical state, where the tree node keeps its children.
+    """
+    if SYMMETRY and hasattr(state, "canonical"):
+        return state.transform_move(move, state.symmetry())
+    return move
+
+def actual_move(state, move):
+    """ Map a move of the canonical state of state back to state.
+    """
+    if SYMMETRY and hasattr(state, "canonical"):
+        return state.restore_move(move, state.symmetry())
+    return move
+
+def symmetric_moves(state):
+    """ Map every move of state to the first move of state which leads to the same pooled state.
+        With SYMMETRY, moves mapped to the same move share one child tree node, whose statistics
+        must be counted once for all of them. Otherwise every move is mapped to itself.
+    """
+    groups = {}
+    first = {}
+    for m in state.get_moves():
+        key = m
+        if SYMMETRY and hasattr(state, "canonical"):
+            st = state.clone()
+            st.do_move(m)
+            key = str(canonical(st)[0])
+        groups[m] = first.setdefault(key, m)
+    return groups
+
 class SearchTree:
     def __init__(self):
         self.__pool = {}
+        self.__memory_history = [] # memory usage at the end of every search
     
     def get_node(self, state, tree_node_creator=None):
+        """ Return the tree node of state, which is the node of its canonical state with SYMMETRY,
+            so moves of its children are those of the canonical state.
+        """
+        (state, sym) = canonical(state)
         key = str(state)
         
         creator = tree_node_creator if tree_node_creator is not None else TreeNode
@@ -417,6 +872,47 @@ class SearchTree:
     def size(self):
         return len(self.__pool)
 
+    def memory_usage(self, sample_size=MEMORY_SAMPLE):
+        """ Estimate the bytes used by the pool from about sample_size evenly spaced nodes.
+            Return a dict with the bytes of each of MEMORY_COMPONENTS, of the pool dict itself
+            ("pool") and in "total", along with "node_count", "sampled" and "exact", which is
+            False where sizes are estimated because the interpreter can not tell them.
+        """
+        count = len(self.__pool)
+        step = max(1, count / max(1, sample_size))
+        usage = dict([(k, 0.0) for k in MEMORY_COMPONENTS])
+        sampled = 0
+        seen = set() # objects shared between nodes are counted once
+
+        for (key, node) in itertools.islice(self.__pool.iteritems(), 0, None, step):
+            usage["keys"] += sizeof(key)
+            for (k, v) in node.memory_usage(seen).items():
+                usage[k] += v
+            sampled += 1
+
+        scale = float(count) / sampled if sampled else 0.0
+        for k in MEMORY_COMPONENTS:
+            usage[k] *= scale
+        usage["pool"] = sizeof(self.__pool)
+        usage["total"] = sum([usage[k] for k in MEMORY_COMPONENTS]) + usage["pool"]
+        usage["node_count"] = count
+        usage["sampled"] = sampled
+        usage["exact"] = SIZEOF_EXACT
+        return usage
+
+    def record_memory(self, sample_size=MEMORY_SAMPLE):
+        """ Record the memory usage at the end of a search, which is the peak of the move
+            since the tree only grows during a search.
+        """
+        usage = self.memory_usage(sample_size)
+        self.__memory_history.append(usage)
+        return usage
+
+    def memory_history(self):
+        """ Memory usage recorded for every move so far, as returned by memory_usage().
+        """
+        return self.__memory_history
+
 class SearchNode:
     """ A node in the game tree. Note wins is always from the viewpoint of player_just_moved.
         Crashes if state not specified.
@@ -449,11 +945,13 @@ class SearchNode:
         """ Use the UCB1 formula to select a child node. Often a constant UCTK is applied so we have
             lambda c: c.wins/c.visits + UCTK * sqrt(2*log(self.visits)/c.visits to vary the amount of
             exploration versus exploitation.
+            The visit counts are those of the edges, since a child may also be visited through other parents,
+            while its value is shared by all of them.
         """
         assert self.child_nodes()        
         creator = search_node_creator if search_node_creator is not None else SearchNode        
-        (move, child) = max(self.child_nodes().items(), key=lambda (m, n): n.ucb(self.__tree_node, constant))
-        node = creator(move, self, child)
+        (move, edge) = max(self.child_nodes().items(), key=lambda (m, e): e.ucb(self.__tree_node, constant))
+        node = creator(move, self, edge.node())
         return node
     
     def add_child(self, move, tree_node, search_node_creator=None):
@@ -467,8 +965,14 @@ class SearchNode:
     
     def update(self, get_result):
         """ update this node - one additional visit and get_result additional wins. get_result must be from the viewpoint of playerJustmoved.
+            Also counts the visit on the edge from the parent node which the search came through.
         """
         self.__tree_node.update(get_result)
+        if self.parent_node is not None:
+            self.parent_node.__tree_node.update_edge(self.move)
+    
+    def update_amaf(self, played, results):
+        self.__tree_node.update_amaf(played, results)
 
     def __repr__(self):
         return "[M:" + str(self.move) + " " + str(self.__tree_node) + "]"
@@ -482,11 +986,13 @@ class SearchNode:
             s += "[M:" + str(k) + " " + str(v) + "]\n"
         return s
     
-def uct(root_state, iter_max, search_tree=None, verbose=True):
+def uct(root_state, iter_max, search_tree=None, verbose=True, rng=None):
     """ Conduct a uct search for __iter_max iterations starting from root_state.
         Return the best move from the root_state.
-        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0]."""
+        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0].
+        Random moves are drawn from rng, the master stream RNG if not given."""
     
+    rng = rng if rng is not None else RNG
     should_clean = True
     
     if search_tree is None:
@@ -496,7 +1002,14 @@ def uct(root_state, iter_max, search_tree=None, verbose=True):
     max_depth = 0
     node_count = search_tree.size()
     
-    root_node = SearchNode(tree_node=search_tree.get_node(root_state))
+    # With UNDO, tree nodes keep no states: a single clone of root_state follows the
+    # selection path and the rollout, and is wound back with undo_move after every iteration
+    creator = stateless_tree_node if UNDO else None
+    state = root_state.clone() if UNDO else None
+    played = []
+    amaf_played = set() # (player, move) pairs of the rollout and, during backpropagation, of the path below
+    
+    root_node = SearchNode(tree_node=search_tree.get_node(root_state, creator))
     
     for i in range(iter_max):
         node = root_node
@@ -504,32 +1017,57 @@ def uct(root_state, iter_max, search_tree=None, verbose=True):
         # Select
         while not node.untried_moves() and node.child_nodes():  # node is fully expanded and non-terminal
             node = node.uct_select_child(1.0)
+            if UNDO:
+                m = actual_move(state, node.move) # node.move is a move of the canonical state of state
+                state.do_move(m)
+                played.append(m)
             
-        state = node.state().clone()
+        if not UNDO:
+            state = node.state().clone()
         
         # Expand
-        m = random.choice(node.untried_moves()) if node.untried_moves() else None
+        m = rng.choice(node.untried_moves()) if node.untried_moves() else None
         if m is not None:  # if we can expand (i.e. state/node is non-terminal)
-            state.do_move(m)
-            node = node.add_child(m, search_tree.get_node(state))  # add child and descend search_tree
+            if UNDO:
+                played.append(actual_move(state, m))
+                state.do_move(played[-1])
+            else:
+                state.do_move(m)
+            node = node.add_child(m, search_tree.get_node(state, creator))  # add child and descend search_tree
         max_depth = max(node.depth, max_depth)
        
         # Rollout - this can often be made orders of magnitude quicker using a state.GetRandomMove() function
         moves = state.get_moves()
         while moves:  # while state is non-terminal
-            state.do_move(random.choice(moves))
+            m = rng.choice(moves)
+            state.do_move(m)
+            if UNDO:
+                played.append(m)
+            if RAVE:
+                amaf_played.add((state.player_just_moved, m))
             moves = state.get_moves()
         
         # Backpropagate
+        results = {1: state.get_result(1), 2: state.get_result(2)} if RAVE else None
         while node != None:  # backpropagate from the expanded node and work back to the root node
             node.update(state.get_result(node.player_just_moved()))  # state is terminal. update node with get_result from POV of node.player_just_moved
+            if RAVE:
+                node.update_amaf(amaf_played, results)
+                amaf_played.add((node.player_just_moved(), node.move))
             node = node.parent_node
+        amaf_played.clear()
+            
+        # Take back all moves of this iteration
+        while played:
+            state.undo_move(played.pop())
 
     selected_node = root_node.uct_select_child(0.0)
 
     if verbose:
         print "Max search depth:", max_depth
         print "Nodes generated:", str(search_tree.size() - node_count)
+        if RECORD_MEMORY: # sampling a large tree takes a noticeable part of a search
+            print "Peak memory:", memory2string(search_tree.record_memory())
         print
         print root_node.children2string()
 
@@ -541,27 +1079,143 @@ def uct(root_state, iter_max, search_tree=None, verbose=True):
     if verbose:
         print
 
-    return selected_node.move
+    return actual_move(root_state, selected_node.move)
 
-def main(uct, search_tree=None):
-    """ Play a single game to the end using uct for both players. 
+def option_parser():
+    """ Create the option parser used by main(). Scripts may add their own options to it.
     """
-    
-    global ITER_MAX
-    global PARALLEL_COUNT
-
     usage = "Usage: %prog [options]"
     parser = optparse.OptionParser(usage=usage)
     parser.add_option("-i", "--itermax", type="int", dest="__iter_max", help="max iteration times")
     parser.add_option("-p", "--parallel", type="int", dest="parallel_count", help="parallel count")
-    (options, args) = parser.parse_args()
-    
+    parser.add_option("-P", "--processes", type="int", dest="process_count", help="process count of hybrid parallelization")
+    parser.add_option("-T", "--threads", type="int", dest="thread_count", help="thread count per process of hybrid parallelization")
+    parser.add_option("--batch", type="int", dest="batch_size", help="iterations between root merges of hybrid parallelization")
+    parser.add_option("-r", "--rave", action="store_true", dest="rave", help="blend all-moves-as-first statistics into uct")
+    parser.add_option("-y", "--symmetry", action="store_true", dest="symmetry", help="share tree nodes between symmetric board positions")
+    parser.add_option("-u", "--undo", action="store_true", dest="undo", help="replay moves with undo_move instead of storing states in tree nodes")
+    parser.add_option("-g", "--game", type="int", dest="game", help="game to play: 0 = Nim, 1 = Othello, 2 = Gobang")
+    parser.add_option("-s", "--seed", type="int", dest="seed", help="master random seed, for reproducible runs")
+    parser.add_option("-b", "--book", dest="book", help="opening book file")
+    parser.add_option("--profile", dest="profile", default=PROFILE_FILE, help="calibration profile file")
+    return parser
+
+def profile_section(game):
+    """ Calibration results depend on the host, the interpreter and the game.
+    """
+    return "%s %s game %d" % (socket.gethostname(), platform.python_implementation(), game)
+
+def read_profile(file_name, game):
+    """ Return the calibrated settings of this host and interpreter for game, or None if not calibrated.
+    """
+    config = ConfigParser.RawConfigParser()
+    config.read(file_name)
+    section = profile_section(game)
+    if not config.has_section(section):
+        return None
+    profile = dict(config.items(section))
+    for k in ["parallel", "processes", "threads", "batch"]:
+        profile[k] = int(profile[k])
+    return profile
+
+def write_profile(file_name, game, profile):
+    """ Store settings for game, keeping the profiles of other hosts, interpreters and games.
+    """
+    config = ConfigParser.RawConfigParser()
+    config.read(file_name)
+    section = profile_section(game)
+    config.remove_section(section) # drop settings of an earlier calibration
+    config.add_section(section)
+    for (k, v) in sorted(profile.items()):
+        config.set(section, k, str(v))
+    with open(file_name, "w") as f:
+        config.write(f)
+
+def apply_profile(profile):
+    """ Set the module settings from a calibration profile.
+    """
+    global PARALLEL_COUNT
+    global PROCESS_COUNT
+    global THREAD_COUNT
+    global BATCH_SIZE
+
+    PARALLEL_COUNT = profile["parallel"]
+    PROCESS_COUNT = profile["processes"]
+    THREAD_COUNT = profile["threads"]
+    BATCH_SIZE = profile["batch"]
+
+def apply_options(options):
+    """ Set the module settings from parsed options.
+    """
+    global ITER_MAX
+    global PARALLEL_COUNT
+    global PROCESS_COUNT
+    global THREAD_COUNT
+    global BATCH_SIZE
+    global GAME
+    global UNDO
+    global RAVE
+    global SYMMETRY
+    global SEED
+    global RNG
+    global OPTIONS
+
+    OPTIONS = options
     ITER_MAX = options.__iter_max if options.__iter_max is not None else ITER_MAX
     PARALLEL_COUNT = options.parallel_count if options.parallel_count is not None else PARALLEL_COUNT
+    PROCESS_COUNT = options.process_count if options.process_count is not None else PROCESS_COUNT
+    THREAD_COUNT = options.thread_count if options.thread_count is not None else THREAD_COUNT
+    BATCH_SIZE = options.batch_size if options.batch_size is not None else BATCH_SIZE
+    GAME = options.game if options.game is not None else GAME
+    UNDO = options.undo if options.undo is not None else UNDO
+    RAVE = options.rave if options.rave is not None else RAVE
+    SYMMETRY = options.symmetry if options.symmetry is not None else SYMMETRY
+
+    if RAVE and SYMMETRY: # AMAF would compare moves of differently oriented boards
+        raise optparse.OptionValueError("--rave and --symmetry can not be combined")
+
+    if options.seed is not None:
+        SEED = options.seed
+        RNG = RandomStream(SEED)
+        random.seed(SEED)
+
+def main(uct, search_tree=None, parser=None, strategy=None, rave=True, undo=True):
+    """ Play a single game to the end using uct for both players. 
+        strategy names the parallelization of uct as in calibrate.py; the calibration
+        profile is only applied if it was calibrated for that strategy.
+        rave and undo are False for uct functions which do not implement RAVE or UNDO,
+        --rave or --undo are rejected then.
+    """
+    
+    parser = parser if parser is not None else option_parser()
+    (options, args) = parser.parse_args()
+
+    if options.rave and not rave:
+        parser.error("--rave is not supported by this parallelization")
+    if options.undo and not undo:
+        parser.error("--undo is not supported by this parallelization")
+
+    profile = read_profile(options.profile, options.game if options.game is not None else GAME)
+    if profile is not None and profile["strategy"] != strategy:
+        profile = None
+    if profile is not None: # options given on the command line still win
+        apply_profile(profile)
+    try:
+        apply_options(options)
+    except optparse.OptionValueError, e:
+        parser.error(str(e))
+
+    book = OpeningBook(options.book) if options.book is not None else None
 
+    if profile is not None:
+        print "Profile:", profile["strategy"]
     print "Max iterations:", ITER_MAX
     print "Parallel count:", PARALLEL_COUNT
+    if SEED is not None:
+        print "Seed:", SEED
+    if book is not None:
+        print "Book entries:", book.size()
     print
     
-    uct_play_game(uct, search_tree)
+    uct_play_game(uct, search_tree, book)
 
@@ -5,8 +5,10 @@ LOG="log"
 TESTS="
     uct.py
     uct-root-parallelization.py 
+    uct-distributed-root-parallelization.py
     uct-tree-parallelization.py 
     uct-leaf-parallelization.py
+    uct-hybrid-parallelization.py
     uct-pickling.py
 "
 
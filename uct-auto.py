@@ -0,0 +1,15 @@
+#!/usr/bin/env pypy
+
+import common
+import calibrate
+
+if __name__ == "__main__":
+    parser = common.option_parser()
+    (options, args) = parser.parse_args()
+
+    profile = common.read_profile(options.profile, options.game if options.game is not None else common.GAME)
+    strategy = profile["strategy"] if profile is not None else "serial" # run calibrate.py first
+
+    (uct, search_tree) = calibrate.strategies()[strategy]
+    supported = strategy in ("serial", "root") # the others do not use common.uct, which implements RAVE and UNDO
+    common.main(uct, search_tree() if search_tree is not None else None, parser, strategy, supported, supported)
@@ -0,0 +1,213 @@
+#!/usr/bin/env pypy
+
+import Queue
+import binascii
+import collections
+import multiprocessing
+import multiprocessing.managers
+import os
+import time
+import common
+
+TIMEOUT = 60.0
+SETTINGS = ["RAVE", "RAVE_EQUIVALENCE", "UNDO", "SYMMETRY"] # globals of common sent with every job, the searches of all hosts must agree on them
+
+class SearchTree(common.SearchTree):
+    def __init__(self):
+        common.SearchTree.__init__(self)
+
+    def clean_sub_tree(self, root_node, ignore_node):
+        pass
+
+job_queue = Queue.Queue()
+result_queue = Queue.Queue()
+
+class JobManager(multiprocessing.managers.BaseManager):
+    """ Serves the job and result queues over TCP, so that workers on other hosts can connect.
+    """
+    pass
+
+JobManager.register("get_job_queue", callable=lambda: job_queue)
+JobManager.register("get_result_queue", callable=lambda: result_queue)
+
+class WorkerManager(multiprocessing.managers.BaseManager):
+    """ Client side of JobManager.
+    """
+    pass
+
+WorkerManager.register("get_job_queue")
+WorkerManager.register("get_result_queue")
+
+def parse_address(address):
+    (host, port) = address.rsplit(":", 1)
+    return (host, int(port))
+
+def work(address, authkey):
+    """ Take jobs from the coordinator at address until it goes away.
+        Every job is a (serial, index, root_state, iter_max, seed, settings) tuple, the result is
+        a (serial, index, {move: (wins, visits)}, tree size) tuple. Moves sharing a child node
+        with SYMMETRY are reported once, under the move common.symmetric_moves maps them to. A search which fails
+        is answered with empty statistics, so that the coordinator need not wait for it.
+    """
+    manager = WorkerManager(address=address, authkey=authkey)
+    manager.connect()
+    jobs = manager.get_job_queue()
+    results = manager.get_result_queue()
+
+    while True:
+        try:
+            job = jobs.get()
+        except (EOFError, IOError):
+            return # coordinator is gone
+
+        if job is None:
+            return
+
+        (serial, index, root_state, iter_max, seed, settings) = job
+        for (k, v) in settings.items():
+            setattr(common, k, v)
+
+        try:
+            tree = SearchTree()
+            common.uct(root_state, iter_max, search_tree=tree, verbose=False, rng=common.RandomStream(seed))
+            root_node = common.SearchNode(tree_node=tree.get_node(root_state))
+            groups = common.symmetric_moves(root_state)
+            stats = dict([(groups[common.actual_move(root_state, m)], (c.node().wins(), c.node().visits() - 1.0)) for (m, c) in root_node.child_nodes().items()]) # without the initial placeholder visit
+            size = tree.size()
+        except Exception, e:
+            print "Search failed:", e
+            (stats, size) = ({}, 0)
+
+        try:
+            results.put((serial, index, stats, size))
+        except (EOFError, IOError):
+            return
+
+class Coordinator:
+    """ Hands out a share of the budget of every move to the workers and merges what they send back.
+    """
+    def __init__(self, address, authkey, worker_count, local_count, timeout):
+        self.__manager = JobManager(address=address, authkey=authkey)
+        self.__manager.start()
+        self.__jobs = self.__manager.get_job_queue()
+        self.__results = self.__manager.get_result_queue()
+        self.__worker_count = worker_count
+        self.__timeout = timeout
+        self.__serial = 0
+
+        print "Coordinator address:", "%s:%d" % self.__manager.address
+        print
+
+        for i in range(local_count):
+            w = multiprocessing.Process(target=work, args=(self.__manager.address, authkey))
+            w.daemon = True
+            w.start()
+
+    def drain(self, queue):
+        """ Throw away jobs and results left over from earlier moves.
+        """
+        try:
+            while True:
+                queue.get_nowait()
+        except Queue.Empty:
+            pass
+
+    def search(self, root_state, iter_max):
+        """ Return the results which arrived for this move before the deadline.
+        """
+        self.__serial += 1
+        self.drain(self.__jobs)
+        self.drain(self.__results)
+
+        settings = dict([(k, getattr(common, k)) for k in SETTINGS])
+        job_count = 0
+        for i in range(self.__worker_count):
+            share = iter_max / self.__worker_count + (1 if i < iter_max % self.__worker_count else 0)
+            if share > 0: # uct can not pick a move without iterations
+                self.__jobs.put((self.__serial, i, root_state, share, common.RNG.next_seed(), settings))
+                job_count += 1
+
+        results = []
+        deadline = time.time() + self.__timeout if self.__timeout is not None else None
+        while len(results) < job_count:
+            remaining = deadline - time.time() if deadline is not None else None
+            if remaining is not None and remaining <= 0.0:
+                break
+
+            try:
+                r = self.__results.get(True, remaining)
+            except Queue.Empty:
+                break
+
+            if r[0] == self.__serial: # late results of earlier moves are dropped
+                results.append(r)
+
+        return sorted(results, key=lambda r: r[1]) # merge in job order, whatever order they arrived in
+
+coordinator = None
+
+def uct(root_state, iter_max):
+    """ Conduct a uct search for __iter_max iterations starting from __root_state.
+        Return the best move from the __root_state.
+        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0]."""
+
+    global coordinator
+
+    options = common.OPTIONS
+
+    if coordinator is None:
+        worker_count = options.worker_count if options.worker_count is not None else common.PARALLEL_COUNT
+        if options.local_count is not None:
+            local_count = options.local_count
+        else:
+            local_count = worker_count if options.address is None else 0
+        address = parse_address(options.address) if options.address is not None else ("localhost", 0)
+        authkey = options.authkey if options.authkey is not None else binascii.hexlify(os.urandom(16)) # local workers only
+        coordinator = Coordinator(address, authkey, worker_count, local_count, options.timeout)
+
+    results = coordinator.search(root_state, iter_max)
+
+    results = [r for r in results if r[2]] # failed searches send no statistics
+    if not results: # nobody answered in time, search locally so that the game goes on
+        print "No worker results, searching locally"
+        print
+        return common.uct(root_state, iter_max, verbose=False)
+
+    wins = collections.defaultdict(float)
+    visits = collections.defaultdict(float)
+    for r in results:
+        for (move, (w, v)) in r[2].items():
+            wins[move] += w
+            visits[move] += v
+
+    print "Worker results:", len(results)
+    print "Nodes generated:", sum([r[3] for r in results])
+    print
+    for (k, v) in visits.items():
+        print "%s: W/V:%.1f/%.1f(%.3f)" % (str(k), wins[k], v, wins[k] / v)
+    print
+
+    return max(visits.items(), key=lambda (k, v): (v, wins[k] / v))[0]
+
+def option_parser():
+    parser = common.option_parser()
+    parser.add_option("--address", dest="address", help="coordinator address host:port, local workers only if not given")
+    parser.add_option("--connect", dest="connect", help="run as a worker of the coordinator at host:port, which sends its search settings with every job")
+    parser.add_option("--authkey", dest="authkey", help="shared secret of coordinator and workers, required with --address and --connect")
+    parser.add_option("--workers", type="int", dest="worker_count", help="number of jobs per move (default: parallel count)")
+    parser.add_option("--local", type="int", dest="local_count", help="number of local workers to start")
+    parser.add_option("--timeout", type="float", dest="timeout", default=TIMEOUT, help="seconds to wait for workers per move")
+    return parser
+
+if __name__ == "__main__":
+    parser = option_parser()
+    (options, args) = parser.parse_args()
+
+    # the job server unpickles whatever it is sent, so it must not be reachable with a known key
+    if (options.address is not None or options.connect is not None) and options.authkey is None:
+        parser.error("--authkey is required with --address and --connect")
+
+    if options.connect is not None:
+        work(parse_address(options.connect), options.authkey)
+    else:
+        common.main(uct, None, parser)
@@ -0,0 +1,145 @@
+#!/usr/bin/env pypy
+
+import multiprocessing
+import common
+
+tree_parallelization = __import__("uct-tree-parallelization")
+
+class RootStatistics:
+    """ Wins and visits of the root moves, shared by all processes.
+    """
+    def __init__(self, moves):
+        self.__moves = moves
+        self.__index = dict([(m, i) for (i, m) in enumerate(moves)])
+        self.__wins = multiprocessing.Array("d", len(moves), lock=False)
+        self.__visits = multiprocessing.Array("d", len(moves), lock=False)
+        self.__lock = multiprocessing.Lock()
+
+    def merge(self, deltas):
+        """ Add deltas {move: (wins, visits)} and return the totals {move: (wins, visits)}.
+        """
+        self.__lock.acquire()
+        for (m, (w, v)) in deltas.items():
+            i = self.__index[m]
+            self.__wins[i] += w
+            self.__visits[i] += v
+        totals = self.totals()
+        self.__lock.release()
+        return totals
+
+    def totals(self):
+        return dict([(m, (self.__wins[i], self.__visits[i])) for (m, i) in self.__index.items()])
+
+class SearchWorker (multiprocessing.Process):
+    """ A process running THREAD_COUNT threads over its own locked tree. Root statistics are
+        merged with the other processes every BATCH_SIZE iterations, per child node: groups
+        maps every root move to the move its statistics are shared under, see common.symmetric_moves.
+    """
+    def __init__(self, root_state, iter_max, thread_count, stats, groups, queue, rng):
+        multiprocessing.Process.__init__(self)
+        self.__rng = rng
+        self.__root_state = root_state
+        self.__groups = groups
+        self.__iter_max = iter_max
+        self.__thread_count = thread_count
+        self.__stats = stats
+        self.__queue = queue
+        self.__published = {} # own statistics already added to stats, by group
+        self.__injected = {} # statistics of the other processes already added to the local tree, by group
+
+    def run(self):
+        tree = tree_parallelization.SearchTree()
+        root_node = tree.get_node(self.__root_state)
+        remaining = self.__iter_max
+
+        while remaining > 0:
+            batch = min(common.BATCH_SIZE, remaining)
+            threads = []
+
+            for i in range(self.__thread_count):
+                share = batch / self.__thread_count + (1 if i < batch % self.__thread_count else 0)
+                threads.append(tree_parallelization.SearchThread(self.__root_state, share, tree, self.__rng.spawn()))
+
+            for t in threads:
+                t.start()
+
+            for t in threads:
+                t.join()
+
+            remaining -= batch
+            self.synchronize(root_node)
+
+        self.__queue.put(tree.size())
+
+    def synchronize(self, root_node):
+        """ Publish what this process learned at the root since the last merge,
+            and pull in what the other processes learned meanwhile.
+        """
+        children = root_node.child_nodes()
+
+        edges = {} # group -> moves of the edges to its child node, several with SYMMETRY
+        for m in children.keys():
+            edges.setdefault(self.__groups[common.actual_move(self.__root_state, m)], []).append(m) # shared statistics are kept by moves of the root state
+
+        deltas = {}
+        for (g, moves) in edges.items():
+            node = children[moves[0]].node()
+            (iw, iv) = self.__injected.get(g, (0.0, 0.0))
+            (ow, ov) = (node.wins() - iw, node.visits() - 1.0 - iv) # without the initial placeholder visit
+            (pw, pv) = self.__published.get(g, (0.0, 0.0))
+            deltas[g] = (ow - pw, ov - pv)
+            self.__published[g] = (ow, ov)
+
+        totals = self.__stats.merge(deltas)
+
+        for (g, moves) in edges.items():
+            (tw, tv) = totals[g]
+            (ow, ov) = self.__published[g]
+            (iw, iv) = self.__injected.get(g, (0.0, 0.0))
+            (dw, dv) = (tw - ow - iw, tv - ov - iv)
+            children[moves[0]].node().merge(dw, dv)
+            for m in moves:
+                root_node.update_edge(m, dv / len(moves)) # the visits of the other processes are spread over the edges to the node
+            root_node.merge(dv - dw, dv) # root wins are from the viewpoint of the other player
+            self.__injected[g] = (tw - ow, tv - ov)
+
+    def get_result(self):
+        return self.__queue.get()
+
+def uct(root_state, iter_max):
+    """ Conduct a uct search for __iter_max iterations starting from __root_state.
+        Return the best move from the __root_state.
+        Assumes 2 alternating players (player 1 starts), with game results in the range [0.0, 1.0]."""
+
+    thread_count = common.THREAD_COUNT
+    process_count = common.PROCESS_COUNT if common.PROCESS_COUNT is not None else max(1, common.PARALLEL_COUNT / thread_count)
+    groups = common.symmetric_moves(root_state)
+    stats = RootStatistics([m for m in root_state.get_moves() if groups[m] == m])
+    workers = []
+
+    for i in range(process_count):
+        share = iter_max / process_count + (1 if i < iter_max % process_count else 0)
+        w = SearchWorker(root_state, share, thread_count, stats, groups, multiprocessing.Queue(), common.RNG.spawn())
+        workers.append(w)
+
+    for w in workers:
+        w.start()
+
+    sizes = [w.get_result() for w in workers]
+
+    for w in workers:
+        w.join()
+
+    totals = dict([(m, (w, v)) for (m, (w, v)) in stats.totals().items() if v > 0.0])
+
+    print "Processes x threads:", process_count, "x", thread_count
+    print "Nodes generated:", sum(sizes)
+    print
+    for (k, (w, v)) in totals.items():
+        print "%s: W/V:%.1f/%.1f(%.3f)" % (str(k), w, v, w / v)
+    print
+
+    return max(totals.items(), key=lambda (k, (w, v)): (v, w / v))[0]
+
+if __name__ == "__main__":
+    common.main(uct, None, strategy="hybrid", rave=False, undo=False)
@@ -2,11 +2,11 @@
 
 import threading
 import common
-import random
     
 class SimulationThread(threading.Thread):
-    def __init__(self, state):
+    def __init__(self, state, rng):
         self.__state = state.clone()
+        self.__rng = rng
         threading.Thread.__init__(self)
         
     def get_result(self, playerjm):
@@ -15,7 +15,7 @@ class SimulationThread(threading.Thread):
     def run(self):
         moves = self.__state.get_moves()
         while moves:  # while state is non-terminal
-            self.__state.do_move(random.choice(moves))
+            self.__state.do_move(self.__rng.choice(moves))
             moves = self.__state.get_moves()
 
 def uct(root_state, iter_max, search_tree):
@@ -26,6 +26,7 @@ def uct(root_state, iter_max, search_tree):
     max_depth = 0
     node_count = search_tree.size()
     root_node = common.SearchNode(tree_node=search_tree.get_node(root_state))
+    streams = [common.RNG.spawn() for i in range(common.PARALLEL_COUNT)] # one per simulation thread
     
     for i in range(iter_max):
         node = root_node
@@ -38,7 +39,7 @@ def uct(root_state, iter_max, search_tree):
         
         # Expand
         if node.untried_moves():  # if we can expand (i.e. state/node is non-terminal)
-            m = random.choice(node.untried_moves())
+            m = common.RNG.choice(node.untried_moves())
             state.do_move(m)
             node = node.add_child(m, search_tree.get_node(state))  # add child and descend tree
         max_depth = max(node.depth, max_depth)
@@ -47,7 +48,7 @@ def uct(root_state, iter_max, search_tree):
         threads = []
         
         for i in range(common.PARALLEL_COUNT):
-            threads.append(SimulationThread(state))
+            threads.append(SimulationThread(state, streams[i]))
         
         for t in threads:
             t.start()
@@ -76,7 +77,7 @@ def uct(root_state, iter_max, search_tree):
     print "Nodes remainning:", str(search_tree.size())
     print
 
-    return selected_node.move
+    return common.actual_move(root_state, selected_node.move)
 
 if __name__ == "__main__":
-    common.main(uct, common.SearchTree())
+    common.main(uct, common.SearchTree(), strategy="leaf", rave=False, undo=False)
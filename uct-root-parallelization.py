@@ -12,17 +12,18 @@ class SearchTree(common.SearchTree):
         pass
 
 class SearchWorker (multiprocessing.Process):
-    def __init__(self, root_state, iter_max, queue):
+    def __init__(self, root_state, iter_max, queue, rng):
         multiprocessing.Process.__init__(self)
         self.__root_state = root_state
         self.__iter_max = iter_max
         self.__queue = queue
+        self.__rng = rng
         
     def run(self):
         tree = SearchTree()
-        common.uct(self.__root_state, self.__iter_max, search_tree=tree, verbose=False)
+        common.uct(self.__root_state, self.__iter_max, search_tree=tree, verbose=False, rng=self.__rng)
         root_node = common.SearchNode(tree_node=tree.get_node(self.__root_state))        
-        values = dict([(m, c.value()) for (m, c) in root_node.child_nodes().items()])
+        values = dict([(common.actual_move(self.__root_state, m), c.node().value()) for (m, c) in root_node.child_nodes().items()])
         self.__queue.put((values, tree.size()))
                 
     def get_result(self):
@@ -36,7 +37,7 @@ def uct(root_state, iter_max):
     workers = []
     
     for i in range(common.PARALLEL_COUNT):
-        w = SearchWorker(root_state, iter_max / common.PARALLEL_COUNT, multiprocessing.Queue());
+        w = SearchWorker(root_state, iter_max / common.PARALLEL_COUNT, multiprocessing.Queue(), common.RNG.spawn());
         workers.append(w);
     
     for w in workers:
@@ -61,4 +62,4 @@ def uct(root_state, iter_max):
     return max(values.items(), key=lambda (k, v): v)[0]
 
 if __name__ == "__main__":
-    common.main(uct, None)
+    common.main(uct, None, strategy="root")
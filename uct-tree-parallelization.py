@@ -1,7 +1,6 @@
 #!/usr/bin/env jython
 
 import threading
-import random
 import math
 import sets
 import common
@@ -24,6 +23,11 @@ class TreeNode(common.TreeNode):
         common.TreeNode.update(self, result)
         self.__lock.release()
         
+    def update_edge(self, move, visits=1.0):
+        self.__lock.acquire()
+        common.TreeNode.update_edge(self, move, visits)
+        self.__lock.release()
+        
     def add_child(self, fm, n):
         self.__lock.acquire()
         common.TreeNode.add_child(self, fm, n)        
@@ -60,11 +64,12 @@ class SearchNode(common.SearchNode):
 
         
 class SearchThread (threading.Thread):
-    def __init__(self, root_state, iter_max, search_tree):
+    def __init__(self, root_state, iter_max, search_tree, rng=None):
         threading.Thread.__init__(self)
         self.__root_state = root_state
         self.__iter_max = iter_max
         self.__search_tree = search_tree
+        self.__rng = rng if rng is not None else common.RNG.spawn()
         
     def run(self):
         root_node = SearchNode(tree_node=self.__search_tree.get_node(self.__root_state))
@@ -80,7 +85,7 @@ class SearchThread (threading.Thread):
 
             # Expand
             node.acquire_lock()
-            m = random.choice(node.untried_moves()) if node.untried_moves() else None
+            m = self.__rng.choice(node.untried_moves()) if node.untried_moves() else None
             node.release_lock()
             if m is not None:  # if we can expand (i.e. state/node is non-terminal)
                 state.do_move(m)
@@ -89,7 +94,7 @@ class SearchThread (threading.Thread):
             # Rollout - this can often be made orders of magnitude quicker using a state.GetRandomMove() function
             moves = state.get_moves()
             while moves:  # while state is non-terminal
-                state.do_move(random.choice(moves))
+                state.do_move(self.__rng.choice(moves))
                 moves = state.get_moves()
 
             # Backpropagate
@@ -126,7 +131,7 @@ def uct(root_state, iter_max, search_tree):
     print "Nodes remainning:", str(search_tree.size())
     print
 
-    return selected_node.move
+    return common.actual_move(root_state, selected_node.move)
 
 if __name__ == "__main__":
-    common.main(uct, SearchTree())
+    common.main(uct, SearchTree(), strategy="tree", rave=False, undo=False)
@@ -3,4 +3,4 @@
 import common
 
 if __name__ == "__main__":
-    common.main(common.uct, common.SearchTree())
+    common.main(common.uct, common.SearchTree(), strategy="serial")